@@ -2,12 +2,13 @@
 # REKS Amusement Com Inc – Marketing Department
 # Streamlit + Supabase (Postgres) payslip system
 # Features
-# - Admin login (via `ADMIN_PASSWORD` in secrets) to manage Employees & Payroll
+# - Admin login (via `ADMIN_PASSWORD_HASH` or `ADMIN_PASSWORD` in secrets) to manage Employees & Payroll
 # - Employee Self-Service to view/download own payslips (by Employee ID)
 # - Bulk upload (Excel/CSV) for Employees and Payroll
 # - Downloadable Excel templates (employee_template.xlsx, payroll_template.xlsx)
 # - Delete employees & payroll entries
 # - Merge duplicate payroll rows (same emp_id + period_start + period_end)
+# - CSV backup export of employees / payroll (re-importable via bulk upload)
 # - PDF payslip generation (ReportLab)
 # - Postgres tables auto-created with proper constraints + ON DELETE CASCADE
 #
@@ -18,17 +19,27 @@
 # reportlab
 # openpyxl
 
+import hashlib
+import hmac
 import io
 import math
+import secrets
+import zipfile
+from contextlib import contextmanager
 from datetime import date, datetime
+from functools import lru_cache
+from itertools import zip_longest
 from typing import Optional
 
 import pandas as pd
-import psycopg2
 import streamlit as st
+from psycopg2 import InterfaceError, OperationalError
+from psycopg2.extras import execute_values
+from psycopg2.pool import ThreadedConnectionPool
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.units import mm
+from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfgen import canvas
 
 # ----------------------------- CONFIG -----------------------------
@@ -36,11 +47,12 @@ COMPANY_NAME = "REKS Amusement Com Inc"
 COMPANY_DEPT = "Marketing Department"
 COMPANY_ADDRESS = ""
 COMPANY_TIN = ""
+PAYROLL_PAGE_SIZE = 200
 
 # ----------------------------- DB -----------------------------
 @st.cache_resource(show_spinner=False)
-def get_conn():
-    """Connect to Supabase Postgres using Streamlit secrets.
+def get_pool() -> ThreadedConnectionPool:
+    """Connection pool for Supabase Postgres, built from Streamlit secrets.
     secrets.toml must contain:
     [postgres]
     host="...supabase.co"
@@ -48,28 +60,67 @@ def get_conn():
     user="postgres"
     password="<YOUR_PASSWORD>"
     port="5432"
+    # optional
+    pool_min=2
+    pool_max=20
     """
     cfg = st.secrets["postgres"]
-    return psycopg2.connect(
+    return ThreadedConnectionPool(
+        minconn=int(cfg.get("pool_min", 2)),
+        maxconn=int(cfg.get("pool_max", 20)),
         host=cfg["host"],
         dbname=cfg["dbname"],
         user=cfg["user"],
         password=cfg["password"],
         port=str(cfg.get("port", "5432")),
         sslmode="require",
+        # TCP keepalives so idle pooled connections are not silently dropped by NAT/poolers.
+        keepalives=1,
+        keepalives_idle=30,
+        keepalives_interval=10,
+        keepalives_count=3,
     )
 
 
+@contextmanager
+def get_conn():
+    """Borrow a connection from the pool; always hand it back.
+    Connections that died (server restart, dropped link) are closed instead of reused."""
+    pool = get_pool()
+    conn = pool.getconn()
+    if conn.closed:
+        pool.putconn(conn, close=True)
+        conn = pool.getconn()
+    broken = False
+    try:
+        yield conn
+    except (OperationalError, InterfaceError):
+        broken = True
+        raise
+    finally:
+        pool.putconn(conn, close=broken or bool(conn.closed))
+
+
 def run_sql(sql: str, params: Optional[tuple] = None, fetch: bool = False):
-    conn = get_conn()
-    with conn:
-        with conn.cursor() as cur:
-            cur.execute(sql, params or ())
-            if fetch:
-                return cur.fetchall()
+    with get_conn() as conn:
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute(sql, params or ())
+                if fetch:
+                    return cur.fetchall()
     return None
 
 
+def fetch_df(sql: str, params: Optional[tuple] = None) -> pd.DataFrame:
+    """Run a SELECT and build the DataFrame straight from the cursor.
+    Column names come from cursor.description, so empty results keep their columns."""
+    with get_conn() as conn:
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute(sql, params or ())
+                return pd.DataFrame.from_records(cur.fetchall(), columns=[d[0] for d in cur.description])
+
+
 def init_db():
     # Employees
     run_sql(
@@ -111,14 +162,33 @@ def init_db():
         );
         """
     )
+    # All Payroll Records pages: ORDER BY created_at DESC, id DESC LIMIT ... OFFSET ...
+    run_sql("CREATE INDEX IF NOT EXISTS payroll_created_idx ON payroll (created_at DESC, id DESC);")
+
+
+@st.cache_resource(show_spinner=False)
+def bootstrap_db() -> bool:
+    """Run the schema setup once per server process instead of on every rerun."""
+    init_db()
+    return True
 
 
 # ----------------------------- UTIL -----------------------------
-def peso(x) -> str:
-    try:
-        return f"₱{float(x):,.2f}"
-    except Exception:
-        return "₱0.00"
+_PESO = "₱{:,.2f}".format
+
+
+@lru_cache(maxsize=4096)
+def _peso_cached(amount) -> str:
+    return _PESO(amount)
+
+
+def peso(amount: float) -> str:
+    """Callers pass numbers (to_float() output, or COALESCEd SQL totals).
+    Payroll amounts repeat a lot (zeros, fixed contributions), so each value is formatted once.
+    NaN/inf bypass the cache (NaN never equals itself) and print as before."""
+    if not math.isfinite(amount):
+        return _PESO(amount)
+    return _peso_cached(amount)
 
 
 def to_float(val) -> float:
@@ -134,98 +204,252 @@ def to_float(val) -> float:
         return 0.0
 
 
+# scrypt cost: 2**14 * 8 * 128 B = 16 MiB per hash, roughly 50 ms.
+SCRYPT_N, SCRYPT_R, SCRYPT_P = 2**14, 8, 1
+
+
+def _scrypt(password: str, salt: str, n: int, r: int, p: int) -> str:
+    return hashlib.scrypt(
+        password.encode(), salt=bytes.fromhex(salt), n=n, r=r, p=p, maxmem=2 * 128 * n * r * p, dklen=32
+    ).hex()
+
+
+def hash_password(password: str) -> str:
+    """Encode a password for the ADMIN_PASSWORD_HASH secret:
+    scrypt$<n>$<r>$<p>$<salt hex>$<hash hex>
+
+    python -c "from streamlit_payslip_generator_python_app import hash_password; print(hash_password('...'))"
+    """
+    salt = secrets.token_hex(16)
+    digest = _scrypt(password, salt, SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    return f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${salt}${digest}"
+
+
+def verify_password(password: str, encoded: str) -> bool:
+    """Check scrypt hashes and legacy pbkdf2_sha256$<iterations>$<salt>$<hash> ones."""
+    try:
+        algo, *params, salt, digest = encoded.split("$")
+        if algo == "scrypt":
+            n, r, p = map(int, params)
+            candidate = _scrypt(password, salt, n, r, p)
+        elif algo == "pbkdf2_sha256":
+            (iterations,) = params
+            candidate = hashlib.pbkdf2_hmac("sha256", password.encode(), bytes.fromhex(salt), int(iterations)).hex()
+        else:
+            return False
+        return hmac.compare_digest(candidate, digest)
+    except (ValueError, TypeError, OverflowError):
+        # Malformed secret (bad field count, non-hex salt, absurd cost, non-ASCII digest): deny, don't crash.
+        return False
+
+
 # ----------------------------- CRUD -----------------------------
+EMPLOYEE_COLS = ("emp_id", "full_name", "position", "department", "rate_type", "base_rate")
+PAYROLL_COLS = (
+    "emp_id", "period_start", "period_end", "basic_pay", "overtime_pay", "allowances", "bonus",
+    "sss", "philhealth", "pagibig", "undertime", "late", "other_deductions", "tax", "notes",
+)
+# (payslip label, payroll column)
+EARNING_FIELDS = (
+    ("Basic Pay", "basic_pay"),
+    ("Overtime Pay", "overtime_pay"),
+    ("Allowances", "allowances"),
+    ("Bonus", "bonus"),
+)
+DEDUCTION_FIELDS = (
+    ("SSS", "sss"),
+    ("PhilHealth", "philhealth"),
+    ("Pag-IBIG", "pagibig"),
+    ("Undertime", "undertime"),
+    ("Late", "late"),
+    ("Other Deductions", "other_deductions"),
+    ("Withholding Tax", "tax"),
+)
+EARNING_COLS = [col for _, col in EARNING_FIELDS]
+DEDUCTION_COLS = [col for _, col in DEDUCTION_FIELDS]
+# SQL expressions for the payslip totals; NULL amounts count as 0
+GROSS_SQL = " + ".join(f"COALESCE({col}, 0)" for col in EARNING_COLS)
+DEDUCTIONS_SQL = " + ".join(f"COALESCE({col}, 0)" for col in DEDUCTION_COLS)
+
+# {rows} is "VALUES %s" for execute_values() or a SELECT from the COPY staging table;
+# the last row per key wins (see _last_per_key).
+EMPLOYEE_UPSERT_SQL = """
+INSERT INTO employees (emp_id, full_name, position, department, rate_type, base_rate)
+{rows}
+ON CONFLICT (emp_id) DO UPDATE SET
+    full_name = EXCLUDED.full_name,
+    position = EXCLUDED.position,
+    department = EXCLUDED.department,
+    rate_type = EXCLUDED.rate_type,
+    base_rate = EXCLUDED.base_rate
+"""
+PAYROLL_UPSERT_SQL = """
+INSERT INTO payroll (
+    emp_id, period_start, period_end, basic_pay, overtime_pay, allowances, bonus,
+    sss, philhealth, pagibig, undertime, late, other_deductions, tax, notes
+) {rows}
+ON CONFLICT (emp_id, period_start, period_end) DO UPDATE SET
+    basic_pay = EXCLUDED.basic_pay,
+    overtime_pay = EXCLUDED.overtime_pay,
+    allowances = EXCLUDED.allowances,
+    bonus = EXCLUDED.bonus,
+    sss = EXCLUDED.sss,
+    philhealth = EXCLUDED.philhealth,
+    pagibig = EXCLUDED.pagibig,
+    undertime = EXCLUDED.undertime,
+    late = EXCLUDED.late,
+    other_deductions = EXCLUDED.other_deductions,
+    tax = EXCLUDED.tax,
+    notes = EXCLUDED.notes
+"""
+
+
+def _last_per_key(rows: list[tuple], key_len: int) -> list[tuple]:
+    """ON CONFLICT DO UPDATE cannot touch the same row twice in one statement.
+    Keep the last row per key, which is what the old row-by-row import ended up storing."""
+    return list({r[:key_len]: r for r in rows}.values())
+
+
+# Above this many rows, COPY into a temp table beats multi-row INSERTs.
+COPY_THRESHOLD = 1024
+_COPY_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+
+def _copy_text(value) -> str:
+    """One field in COPY text format: \\N for NULL, backslash escapes otherwise."""
+    if value is None:
+        return r"\N"
+    return str(value).translate(_COPY_ESCAPES)
+
+
+def _copy_upsert(cur, table: str, cols, upsert_sql: str, rows: list[tuple]):
+    """Stream rows into a temp staging table with COPY, then merge them with one INSERT ... SELECT."""
+    stage = f"{table}_stage"
+    col_list = ", ".join(cols)
+    cur.execute(f"CREATE TEMP TABLE {stage} ON COMMIT DROP AS SELECT {col_list} FROM {table} WITH NO DATA")
+    buf = io.StringIO("".join("\t".join(map(_copy_text, r)) + "\n" for r in rows))
+    cur.copy_expert(f"COPY {stage} ({col_list}) FROM STDIN", buf)
+    cur.execute(upsert_sql.format(rows=f"SELECT {col_list} FROM {stage}"))
+
+
+def bulk_upsert_employees(rows: list[tuple]) -> int:
+    """Upsert employee tuples (EMPLOYEE_COLS order) in one transaction."""
+    rows = _last_per_key(rows, 1)
+    if not rows:
+        return 0
+    with get_conn() as conn:
+        with conn:
+            with conn.cursor() as cur:
+                if len(rows) > COPY_THRESHOLD:
+                    _copy_upsert(cur, "employees", EMPLOYEE_COLS, EMPLOYEE_UPSERT_SQL, rows)
+                else:
+                    execute_values(cur, EMPLOYEE_UPSERT_SQL.format(rows="VALUES %s"), rows, page_size=1000)
+    clear_employee_cache()
+    return len(rows)
+
+
 def upsert_employee(emp_id, full_name, position, department, rate_type, base_rate):
-    run_sql(
-        """
-        INSERT INTO employees (emp_id, full_name, position, department, rate_type, base_rate)
-        VALUES (%s, %s, %s, %s, %s, %s)
-        ON CONFLICT (emp_id) DO UPDATE SET
-            full_name = EXCLUDED.full_name,
-            position = EXCLUDED.position,
-            department = EXCLUDED.department,
-            rate_type = EXCLUDED.rate_type,
-            base_rate = EXCLUDED.base_rate;
-        """,
-        (emp_id, full_name, position, department, rate_type, to_float(base_rate)),
-    )
+    bulk_upsert_employees([(emp_id, full_name, position, department, rate_type, to_float(base_rate))])
 
 
 def delete_employee(emp_id: str):
     run_sql("DELETE FROM employees WHERE emp_id=%s", (emp_id,))
+    # ON DELETE CASCADE removes their payroll rows too
+    clear_employee_cache()
+    clear_payroll_cache()
 
 
+@st.cache_data(ttl=300, show_spinner=False)
 def list_employees_df() -> pd.DataFrame:
-    rows = run_sql(
-        "SELECT emp_id, full_name, position, department, rate_type, base_rate, created_at FROM employees ORDER BY full_name",
-        fetch=True,
+    df = fetch_df(
+        "SELECT emp_id, full_name, position, department, rate_type, base_rate, created_at FROM employees ORDER BY full_name"
     )
-    return pd.DataFrame(rows, columns=["emp_id", "full_name", "position", "department", "rate_type", "base_rate", "created_at"]) if rows else pd.DataFrame(columns=["emp_id", "full_name", "position", "department", "rate_type", "base_rate", "created_at"])
+    # NUMERIC arrives as Decimal objects; a handful of departments / rate types repeat across every row.
+    df["base_rate"] = df["base_rate"].astype("float64")
+    return df.astype({"department": "category", "rate_type": "category"})
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def employee_options() -> dict[str, str]:
+    """{emp_id: "Full Name (emp_id)"} in name order, for selectboxes."""
+    rows = run_sql("SELECT emp_id, full_name FROM employees ORDER BY full_name", fetch=True)
+    return {emp_id: f"{full_name} ({emp_id})" for emp_id, full_name in rows or []}
+
+
+def compute_totals(df: pd.DataFrame) -> pd.DataFrame:
+    """Add gross / deductions / net columns to a payroll DataFrame, row-wise, in one NumPy pass."""
+    earn = df[EARNING_COLS].to_numpy(dtype=float, na_value=0.0).sum(axis=1)
+    ded = df[DEDUCTION_COLS].to_numpy(dtype=float, na_value=0.0).sum(axis=1)
+    return df.assign(gross=earn, deductions=ded, net=earn - ded)
+
+
+def existing_emp_ids(emp_ids) -> set[str]:
+    rows = run_sql("SELECT emp_id FROM employees WHERE emp_id = ANY(%s)", (list(emp_ids),), fetch=True)
+    return {r[0] for r in rows or []}
+
+
+def bulk_upsert_payroll(rows: list[tuple]) -> int:
+    """Upsert payroll tuples (PAYROLL_COLS order) in one transaction.
+    Uses UNIQUE(emp_id, period_start, period_end) as the conflict target."""
+    rows = _last_per_key(rows, 3)
+    if not rows:
+        return 0
+    with get_conn() as conn:
+        with conn:
+            with conn.cursor() as cur:
+                if len(rows) > COPY_THRESHOLD:
+                    _copy_upsert(cur, "payroll", PAYROLL_COLS, PAYROLL_UPSERT_SQL, rows)
+                else:
+                    execute_values(cur, PAYROLL_UPSERT_SQL.format(rows="VALUES %s"), rows, page_size=1000)
+    clear_payroll_cache()
+    return len(rows)
+
+
+def _payroll_tuple(row: dict) -> tuple:
+    """Coerce a payroll dict once into a PAYROLL_COLS-ordered tuple for bulk_upsert_payroll."""
+    amounts = tuple(to_float(row.get(col)) for col in EARNING_COLS + DEDUCTION_COLS)
+    return (row.get("emp_id"), row.get("period_start"), row.get("period_end"), *amounts, row.get("notes") or None)
 
 
 def insert_or_update_payroll(row: dict):
-    # Uses upsert based on UNIQUE(emp_id, period_start, period_end)
-    run_sql(
-        """
-        INSERT INTO payroll (
-            emp_id, period_start, period_end, basic_pay, overtime_pay, allowances, bonus,
-            sss, philhealth, pagibig, undertime, late, other_deductions, tax, notes
-        ) VALUES (
-            %(emp_id)s, %(period_start)s, %(period_end)s, %(basic_pay)s, %(overtime_pay)s, %(allowances)s, %(bonus)s,
-            %(sss)s, %(philhealth)s, %(pagibig)s, %(undertime)s, %(late)s, %(other_deductions)s, %(tax)s, %(notes)s
-        )
-        ON CONFLICT (emp_id, period_start, period_end) DO UPDATE SET
-            basic_pay = EXCLUDED.basic_pay,
-            overtime_pay = EXCLUDED.overtime_pay,
-            allowances = EXCLUDED.allowances,
-            bonus = EXCLUDED.bonus,
-            sss = EXCLUDED.sss,
-            philhealth = EXCLUDED.philhealth,
-            pagibig = EXCLUDED.pagibig,
-            undertime = EXCLUDED.undertime,
-            late = EXCLUDED.late,
-            other_deductions = EXCLUDED.other_deductions,
-            tax = EXCLUDED.tax,
-            notes = EXCLUDED.notes;
-        """,
-        {
-            "emp_id": row.get("emp_id"),
-            "period_start": row.get("period_start"),
-            "period_end": row.get("period_end"),
-            "basic_pay": to_float(row.get("basic_pay")),
-            "overtime_pay": to_float(row.get("overtime_pay")),
-            "allowances": to_float(row.get("allowances")),
-            "bonus": to_float(row.get("bonus")),
-            "sss": to_float(row.get("sss")),
-            "philhealth": to_float(row.get("philhealth")),
-            "pagibig": to_float(row.get("pagibig")),
-            "undertime": to_float(row.get("undertime")),
-            "late": to_float(row.get("late")),
-            "other_deductions": to_float(row.get("other_deductions")),
-            "tax": to_float(row.get("tax")),
-            "notes": (row.get("notes") or None),
-        },
-    )
+    bulk_upsert_payroll([_payroll_tuple(row)])
 
 
 def delete_payroll(id_: int):
     run_sql("DELETE FROM payroll WHERE id=%s", (id_,))
+    clear_payroll_cache()
+
+
+@st.cache_data(ttl=300, show_spinner=False)
+def list_payroll_df(limit: int, offset: int = 0) -> pd.DataFrame:
+    """One page (limit/offset) of all payroll rows, newest first."""
+    df = fetch_df("SELECT * FROM payroll ORDER BY created_at DESC, id DESC LIMIT %s OFFSET %s", (limit, offset))
+    # Decimal objects -> float64 so pandas/NumPy work on native arrays
+    amount_cols = EARNING_COLS + DEDUCTION_COLS
+    df[amount_cols] = df[amount_cols].astype("float64")
+    return df
+
+
+@st.cache_data(ttl=300, show_spinner=False)
+def count_payroll() -> int:
+    return run_sql("SELECT COUNT(*) FROM payroll", fetch=True)[0][0]
+
+
+@st.cache_data(ttl=300, show_spinner=False)
+def payroll_totals_by_period() -> pd.DataFrame:
+    return fetch_df(
+        f"""
+        SELECT period_start, period_end, COUNT(*) AS employees,
+               SUM({GROSS_SQL}) AS gross, SUM({DEDUCTIONS_SQL}) AS deductions,
+               SUM(({GROSS_SQL}) - ({DEDUCTIONS_SQL})) AS net
+        FROM payroll
+        GROUP BY period_start, period_end
+        ORDER BY period_start DESC, period_end DESC
+        """
+    )
 
 
-def list_payroll_df(emp_id: Optional[str] = None) -> pd.DataFrame:
-    if emp_id:
-        rows = run_sql(
-            "SELECT * FROM payroll WHERE emp_id=%s ORDER BY period_start DESC", (emp_id,), fetch=True
-        )
-    else:
-        rows = run_sql("SELECT * FROM payroll ORDER BY created_at DESC", fetch=True)
-    cols = [
-        "id","emp_id","period_start","period_end","basic_pay","overtime_pay","allowances","bonus",
-        "sss","philhealth","pagibig","undertime","late","other_deductions","tax","notes","created_at"
-    ]
-    return pd.DataFrame(rows, columns=cols) if rows else pd.DataFrame(columns=cols)
-
-
+@st.cache_data(ttl=60, show_spinner=False)
 def get_employee(emp_id: str) -> Optional[dict]:
     rows = run_sql(
         "SELECT emp_id, full_name, position, department FROM employees WHERE emp_id=%s",
@@ -238,62 +462,178 @@ def get_employee(emp_id: str) -> Optional[dict]:
     return {"emp_id": r[0], "full_name": r[1], "position": r[2], "department": r[3]}
 
 
-def merge_duplicate_payroll():
-    """Keep latest id for duplicates on (emp_id, period_start, period_end); delete the rest."""
-    dups = run_sql(
-        """
-        WITH ranked AS (
-          SELECT id, emp_id, period_start, period_end,
-                 ROW_NUMBER() OVER (PARTITION BY emp_id, period_start, period_end ORDER BY id DESC) AS rn
-          FROM payroll
+@st.cache_data(ttl=60, show_spinner=False)
+def list_payroll_periods(emp_id: Optional[str] = None) -> list[tuple]:
+    """(period_start, period_end) pairs, newest first; all employees when emp_id is None."""
+    if emp_id:
+        rows = run_sql(
+            "SELECT DISTINCT period_start, period_end FROM payroll WHERE emp_id=%s ORDER BY period_start DESC, period_end DESC",
+            (emp_id,),
+            fetch=True,
         )
-        DELETE FROM payroll p
-        USING ranked r
-        WHERE p.id = r.id AND r.rn > 1
-        RETURNING p.id;
-        """,
-        fetch=True,
-    )
-    return len(dups or [])
+    else:
+        rows = run_sql(
+            "SELECT DISTINCT period_start, period_end FROM payroll ORDER BY period_start DESC, period_end DESC",
+            fetch=True,
+        )
+    return [tuple(r) for r in rows or []]
+
+
+def list_period_payslips(period_start, period_end) -> list[tuple[dict, dict]]:
+    """(payroll_row, employee_row) pairs for everyone paid in one period."""
+    with get_conn() as conn:
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    SELECT p.*, e.full_name, e.position, e.department
+                    FROM payroll p JOIN employees e USING (emp_id)
+                    WHERE p.period_start=%s AND p.period_end=%s
+                    ORDER BY e.full_name
+                    """,
+                    (period_start, period_end),
+                )
+                cols = [d[0] for d in cur.description]
+                records = [dict(zip(cols, r)) for r in cur.fetchall()]
+    emp_keys = ("emp_id", "full_name", "position", "department")
+    return [
+        ({k: v for k, v in r.items() if k not in emp_keys[1:]}, {k: r[k] for k in emp_keys})
+        for r in records
+    ]
 
 
-# ----------------------------- PDF -----------------------------
-def make_payslip_pdf(payroll_row: dict, employee_row: dict) -> bytes:
+@st.cache_data(ttl=60, show_spinner=False)
+def get_payslip(emp_id: str, period_start, period_end) -> Optional[dict]:
+    """One payroll row with gross / deductions / net computed by Postgres."""
+    with get_conn() as conn:
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    f"""
+                    SELECT t.*, t.gross - t.deductions AS net
+                    FROM (
+                        SELECT p.*, {GROSS_SQL} AS gross, {DEDUCTIONS_SQL} AS deductions
+                        FROM payroll p
+                        WHERE emp_id=%s AND period_start=%s AND period_end=%s
+                    ) t
+                    """,
+                    (emp_id, period_start, period_end),
+                )
+                r = cur.fetchone()
+                if r is None:
+                    return None
+                return dict(zip([d[0] for d in cur.description], r))
+
+
+def merge_duplicate_payroll():
+    """Keep latest id for duplicates on (emp_id, period_start, period_end); delete the rest.
+    One statement, one round-trip; the count comes from rowcount rather than shipping ids back."""
+    with get_conn() as conn:
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """
+                    WITH ranked AS (
+                      SELECT id,
+                             ROW_NUMBER() OVER (PARTITION BY emp_id, period_start, period_end ORDER BY id DESC) AS rn
+                      FROM payroll
+                    )
+                    DELETE FROM payroll p
+                    USING ranked r
+                    WHERE p.id = r.id AND r.rn > 1;
+                    """
+                )
+                removed = cur.rowcount
+    clear_payroll_cache()
+    return removed
+
+
+EXPORT_COLUMNS = {"employees": EMPLOYEE_COLS, "payroll": PAYROLL_COLS}
+
+
+def export_table_csv(table: str) -> bytes:
+    """Dump a table as CSV with COPY ... TO STDOUT; Postgres writes the CSV, no DataFrame in between.
+    Columns match the upload templates so the file can be re-imported as-is."""
+    if table not in EXPORT_COLUMNS:
+        raise ValueError(f"Unknown table: {table}")
+    cols = ", ".join(EXPORT_COLUMNS[table])
     buf = io.BytesIO()
-    c = canvas.Canvas(buf, pagesize=A4)
-    width, height = A4
-
-    margin = 18 * mm
-    x0 = margin
-    y = height - margin
-
-    def draw_header():
-        nonlocal y
-        c.setFont("Helvetica-Bold", 14)
-        c.drawString(x0, y, COMPANY_NAME)
-        y -= 14
-        c.setFont("Helvetica", 10)
-        if COMPANY_DEPT:
-            c.drawString(x0, y, COMPANY_DEPT)
-            y -= 12
-        if COMPANY_ADDRESS:
-            c.drawString(x0, y, COMPANY_ADDRESS)
-            y -= 12
-        if COMPANY_TIN:
-            c.drawString(x0, y, f"TIN: {COMPANY_TIN}")
-            y -= 14
-        c.line(x0, y, width - margin, y)
-        y -= 16
-
-    def label_value(label, value):
-        nonlocal y
-        c.setFont("Helvetica-Bold", 10)
-        c.drawString(x0, y, label)
-        c.setFont("Helvetica", 10)
-        c.drawString(x0 + 120, y, value)
-        y -= 12
-
-    draw_header()
+    with get_conn() as conn:
+        with conn:
+            with conn.cursor() as cur:
+                cur.copy_expert(f"COPY {table} ({cols}) TO STDOUT WITH CSV HEADER", buf)
+    return buf.getvalue()
+
+
+def clear_employee_cache():
+    """Drop cached employee reads after a write."""
+    list_employees_df.clear()
+    employee_options.clear()
+    get_employee.clear()
+
+
+def clear_payroll_cache():
+    """Drop cached payroll reads after a write."""
+    list_payroll_df.clear()
+    count_payroll.clear()
+    payroll_totals_by_period.clear()
+    list_payroll_periods.clear()
+    get_payslip.clear()
+
+
+# ----------------------------- PDF -----------------------------
+PAGE_WIDTH, PAGE_HEIGHT = A4
+MARGIN = 18 * mm
+X_LEFT = MARGIN
+X_VALUE = MARGIN + 120
+X_MID = PAGE_WIDTH / 2
+X_RIGHT = PAGE_WIDTH - MARGIN
+FOOTER_Y = 12 * mm
+AMOUNT_ROWS = max(len(EARNING_FIELDS), len(DEDUCTION_FIELDS))
+PAGE_FORM = "payslip_page"
+
+# Load the standard font metrics once at import instead of on the first payslip.
+for _font in ("Helvetica", "Helvetica-Bold"):
+    pdfmetrics.getFont(_font)
+
+
+def _define_page_form(c: canvas.Canvas) -> float:
+    """Record everything that is identical on every page (company header, footer)
+    once per document as a Form XObject. Returns the y coordinate just below the header."""
+    y = PAGE_HEIGHT - MARGIN
+
+    # (font, size, text, line advance); blank lines are skipped
+    lines = [
+        ("Helvetica-Bold", 14, COMPANY_NAME, 14),
+        ("Helvetica", 10, COMPANY_DEPT, 12),
+        ("Helvetica", 10, COMPANY_ADDRESS, 12),
+        ("Helvetica", 10, f"TIN: {COMPANY_TIN}" if COMPANY_TIN else "", 14),
+    ]
+
+    c.beginForm(PAGE_FORM)
+    current_font = None
+    for font, size, text, dy in lines:
+        if not text:
+            continue
+        if (font, size) != current_font:
+            c.setFont(font, size)
+            current_font = (font, size)
+        c.drawString(X_LEFT, y, text)
+        y -= dy
+    c.line(X_LEFT, y, X_RIGHT, y)
+
+    c.saveState()
+    c.setFont("Helvetica", 8)
+    c.setFillColor(colors.grey)
+    c.drawString(X_LEFT, FOOTER_Y, f"Generated on {datetime.now().strftime('%Y-%m-%d %H:%M')} via REKS Payslip App")
+    c.restoreState()
+    c.endForm()
+    return y - 16
+
+
+def _draw_payslip(c: canvas.Canvas, payroll_row: dict, employee_row: dict, y: float):
+    """Draw one payslip page over the page form; y is where the body starts."""
+    c.doForm(PAGE_FORM)
 
     # Employee + Period
     emp_name = employee_row.get("full_name", "")
@@ -304,120 +644,199 @@ def make_payslip_pdf(payroll_row: dict, employee_row: dict) -> bytes:
     period_start = str(payroll_row.get("period_start") or "")
     period_end = str(payroll_row.get("period_end") or "")
 
-    label_value("Employee Name:", emp_name)
-    label_value("Employee ID:", emp_id)
+    fields = [("Employee Name:", emp_name), ("Employee ID:", emp_id)]
     if position:
-        label_value("Position:", position)
+        fields.append(("Position:", position))
     if department:
-        label_value("Department:", department)
-    label_value("Pay Period:", f"{period_start} to {period_end}")
+        fields.append(("Department:", department))
+    fields.append(("Pay Period:", f"{period_start} to {period_end}"))
+
+    # All labels in bold, then all values in regular: two font switches instead of two per line.
+    c.setFont("Helvetica-Bold", 10)
+    for i, (label, _) in enumerate(fields):
+        c.drawString(X_LEFT, y - 12 * i, label)
+    c.setFont("Helvetica", 10)
+    for i, (_, value) in enumerate(fields):
+        c.drawString(X_VALUE, y - 12 * i, value)
+    y -= 12 * len(fields)
 
     y -= 6
-    c.line(x0, y, width - margin, y)
+    c.line(X_LEFT, y, X_RIGHT, y)
     y -= 16
 
-    earnings = [
-        ("Basic Pay", to_float(payroll_row.get("basic_pay"))),
-        ("Overtime Pay", to_float(payroll_row.get("overtime_pay"))),
-        ("Allowances", to_float(payroll_row.get("allowances"))),
-        ("Bonus", to_float(payroll_row.get("bonus"))),
-    ]
-    deductions = [
-        ("SSS", to_float(payroll_row.get("sss"))),
-        ("PhilHealth", to_float(payroll_row.get("philhealth"))),
-        ("Pag-IBIG", to_float(payroll_row.get("pagibig"))),
-        ("Undertime", to_float(payroll_row.get("undertime"))),
-        ("Late", to_float(payroll_row.get("late"))),
-        ("Other Deductions", to_float(payroll_row.get("other_deductions"))),
-        ("Withholding Tax", to_float(payroll_row.get("tax"))),
-    ]
-
-    gross = sum(v for _, v in earnings)
-    total_deductions = sum(v for _, v in deductions)
-    net = gross - total_deductions
-
     c.setFont("Helvetica-Bold", 11)
-    c.drawString(x0, y, "EARNINGS")
-    c.drawString(width / 2, y, "DEDUCTIONS")
+    c.drawString(X_LEFT, y, "EARNINGS")
+    c.drawString(X_MID, y, "DEDUCTIONS")
     y -= 12
 
+    # Both columns side by side, drawn and totalled in one pass.
     c.setFont("Helvetica", 10)
-    y_left = y
-    for label, val in earnings:
-        c.drawString(x0, y_left, label)
-        c.drawRightString(width / 2 - 10, y_left, peso(val))
-        y_left -= 12
-
-    y_right = y
-    for label, val in deductions:
-        c.drawString(width / 2 + 10, y_right, label)
-        c.drawRightString(width - margin, y_right, peso(val))
-        y_right -= 12
-
-    y = min(y_left, y_right) - 10
-    c.line(x0, y, width - margin, y)
+    gross = total_deductions = 0.0
+    for i, (earning, deduction) in enumerate(zip_longest(EARNING_FIELDS, DEDUCTION_FIELDS)):
+        row_y = y - 12 * i
+        if earning:
+            label, key = earning
+            val = to_float(payroll_row.get(key))
+            gross += val
+            c.drawString(X_LEFT, row_y, label)
+            c.drawRightString(X_MID - 10, row_y, peso(val))
+        if deduction:
+            label, key = deduction
+            val = to_float(payroll_row.get(key))
+            total_deductions += val
+            c.drawString(X_MID + 10, row_y, label)
+            c.drawRightString(X_RIGHT, row_y, peso(val))
+    net = gross - total_deductions
+
+    y -= 12 * AMOUNT_ROWS + 10
+    c.line(X_LEFT, y, X_RIGHT, y)
     y -= 14
 
     c.setFont("Helvetica-Bold", 11)
-    c.drawString(x0, y, "Gross Pay:")
-    c.drawRightString(width / 2 - 10, y, peso(gross))
-    c.drawString(width / 2 + 10, y, "Total Deductions:")
-    c.drawRightString(width - margin, y, peso(total_deductions))
+    c.drawString(X_LEFT, y, "Gross Pay:")
+    c.drawRightString(X_MID - 10, y, peso(gross))
+    c.drawString(X_MID + 10, y, "Total Deductions:")
+    c.drawRightString(X_RIGHT, y, peso(total_deductions))
 
     y -= 18
     c.setFont("Helvetica-Bold", 12)
-    c.drawString(x0, y, "NET PAY:")
-    c.drawRightString(width - margin, y, peso(net))
+    c.drawString(X_LEFT, y, "NET PAY:")
+    c.drawRightString(X_RIGHT, y, peso(net))
 
     y -= 20
     notes = str(payroll_row.get("notes") or "").strip()
     if notes:
         c.setFont("Helvetica", 9)
-        c.drawString(x0, y, f"Notes: {notes}")
-        y -= 12
+        c.drawString(X_LEFT, y, f"Notes: {notes}")
 
-    c.setFont("Helvetica", 8)
-    c.setFillColor(colors.grey)
-    c.drawString(x0, 12 * mm, f"Generated on {datetime.now().strftime('%Y-%m-%d %H:%M')} via REKS Payslip App")
 
-    c.showPage()
+def make_payslips_pdf(jobs: list[tuple[dict, dict]]) -> bytes:
+    """Render (payroll_row, employee_row) pairs as pages of one PDF.
+    The header and footer are drawn once and referenced from every page."""
+    buf = io.BytesIO()
+    # Compressed content streams; invariant drops the creation timestamp/ID so equal input gives equal bytes.
+    c = canvas.Canvas(buf, pagesize=A4, pageCompression=1, invariant=1)
+    body_top = _define_page_form(c)
+    for payroll_row, employee_row in jobs:
+        _draw_payslip(c, payroll_row, employee_row, body_top)
+        c.showPage()
     c.save()
     pdf = buf.getvalue()
     buf.close()
     return pdf
 
 
+def make_payslip_pdf(payroll_row: dict, employee_row: dict) -> bytes:
+    return make_payslips_pdf([(payroll_row, employee_row)])
+
+
+@st.cache_data(ttl=300, show_spinner=False, max_entries=256)
+def cached_payslip_pdf(payroll_row: dict, employee_row: dict) -> bytes:
+    """make_payslip_pdf() memoised on the row contents, so reruns reuse the bytes
+    and any edit to the payroll row produces a new key. Bounded to a few MB of PDFs;
+    the ttl keeps the footer's "Generated on" time at most five minutes old."""
+    return make_payslip_pdf(payroll_row, employee_row)
+
+
+def payslip_filename(payroll_row: dict) -> str:
+    return f"payslip_{payroll_row.get('emp_id')}_{payroll_row.get('period_start')}_{payroll_row.get('period_end')}.pdf"
+
+
+def bulk_generate_payslips(jobs: list[tuple[dict, dict]]) -> bytes:
+    """Render (payroll_row, employee_row) payslips, one PDF per employee, and zip them.
+    A payslip renders in ~2 ms, so a department's payroll needs no worker processes."""
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        for payroll_row, employee_row in jobs:
+            zf.writestr(payslip_filename(payroll_row), make_payslip_pdf(payroll_row, employee_row))
+    return buf.getvalue()
+
+
 # ----------------------------- UI -----------------------------
+def _verify_admin_attempt(pwd: str, hashed: str) -> bool:
+    """verify_password() once per distinct attempt: every widget interaction reruns the
+    script, and the KDF should not run again for a password already checked this session.
+    The attempt is remembered only as an HMAC under a random per-session key."""
+    key = st.session_state.setdefault("_admin_attempt_key", secrets.token_bytes(16))
+    tag = hmac.new(key, f"{hashed}\0{pwd}".encode(), hashlib.sha256).digest()
+    last = st.session_state.get("_admin_attempt")
+    if last is None or last[0] != tag:
+        last = st.session_state["_admin_attempt"] = (tag, verify_password(pwd, hashed))
+    return last[1]
+
+
 def admin_gate() -> bool:
     st.sidebar.subheader("Admin sign-in")
     pwd = st.sidebar.text_input("Admin password", type="password")
+    hashed = st.secrets.get("ADMIN_PASSWORD_HASH")
+    if hashed:
+        return bool(pwd) and _verify_admin_attempt(pwd, hashed)
     expected = st.secrets.get("ADMIN_PASSWORD")
     if expected:
-        return pwd == expected
+        return hmac.compare_digest(pwd.encode(), str(expected).encode())
     return bool(pwd)
 
 
-def download_employee_template():
-    cols = ["emp_id","full_name","position","department","rate_type","base_rate"]
-    df = pd.DataFrame(columns=cols)
+def _excel_template(cols, sheet_name: str) -> bytes:
     buf = io.BytesIO()
     with pd.ExcelWriter(buf, engine="openpyxl") as xw:
-        df.to_excel(xw, index=False, sheet_name="employees")
-    buf.seek(0)
-    return buf
+        pd.DataFrame(columns=list(cols)).to_excel(xw, index=False, sheet_name=sheet_name)
+    return buf.getvalue()
 
 
-def download_payroll_template():
-    cols = [
-        "emp_id","period_start","period_end","basic_pay","overtime_pay","allowances","bonus",
-        "sss","philhealth","pagibig","undertime","late","other_deductions","tax","notes"
-    ]
-    df = pd.DataFrame(columns=cols)
-    buf = io.BytesIO()
-    with pd.ExcelWriter(buf, engine="openpyxl") as xw:
-        df.to_excel(xw, index=False, sheet_name="payroll")
-    buf.seek(0)
-    return buf
+@st.cache_data(show_spinner=False)
+def download_employee_template() -> bytes:
+    return _excel_template(EMPLOYEE_COLS, "employees")
+
+
+@st.cache_data(show_spinner=False)
+def download_payroll_template() -> bytes:
+    return _excel_template(PAYROLL_COLS, "payroll")
+
+
+def _text_col(df: pd.DataFrame, col: str) -> pd.Series:
+    if col not in df.columns:
+        return pd.Series("", index=df.index, dtype=object)
+    return df[col].fillna("").astype(str).str.strip()
+
+
+def _num_col(df: pd.DataFrame, col: str) -> pd.Series:
+    """Column-wise to_float(): blanks, junk and NaN become 0.0; '1,000' is accepted."""
+    if col not in df.columns:
+        return pd.Series(0.0, index=df.index)
+    s = df[col]
+    if not pd.api.types.is_numeric_dtype(s):
+        s = s.astype(str).str.replace(",", "", regex=False).str.strip()
+    s = pd.to_numeric(s, errors="coerce").astype(float)
+    # "inf" / "1e999" parse as infinity; treat them like any other junk value.
+    return s.replace([math.inf, -math.inf], 0.0).fillna(0.0)
+
+
+def _prepare_employees_df(df: pd.DataFrame) -> pd.DataFrame:
+    out = pd.DataFrame({c: _text_col(df, c) for c in EMPLOYEE_COLS[:-1]}, index=df.index)
+    out["base_rate"] = _num_col(df, "base_rate")
+    return out
+
+
+def _prepare_payroll_df(df: pd.DataFrame) -> pd.DataFrame:
+    out = pd.DataFrame({"emp_id": _text_col(df, "emp_id")}, index=df.index)
+    for c in ("period_start", "period_end"):
+        # Uploads mix formats ("August 1 2025", "01/08/2025"); parse each value on its own.
+        out[c] = pd.to_datetime(df[c], errors="coerce", format="mixed")
+    for c in PAYROLL_COLS[3:-1]:
+        out[c] = _num_col(df, c)
+    notes = _text_col(df, "notes")
+    # object dtype so blanks become None (SQL NULL) rather than NaN
+    out["notes"] = notes.astype(object).where(notes != "", None)
+    return out
+
+
+def read_upload(file) -> pd.DataFrame:
+    """Read an uploaded .csv / .xlsx. The default C parser pads short rows with NaN,
+    which hand-edited CSVs rely on (e.g. a trailing blank notes column)."""
+    if file.name.lower().endswith(".csv"):
+        return pd.read_csv(file)
+    return pd.read_excel(file)
 
 
 def import_employees_from_df(df: pd.DataFrame) -> tuple[int, list[str]]:
@@ -426,20 +845,13 @@ def import_employees_from_df(df: pd.DataFrame) -> tuple[int, list[str]]:
     if not required.issubset(set(df.columns)):
         missing = ", ".join(sorted(required - set(df.columns)))
         raise ValueError(f"Employees sheet missing required columns: {missing}")
-    count = 0
-    for _, r in df.iterrows():
-        emp_id = str(r.get("emp_id")).strip()
-        full_name = str(r.get("full_name")).strip()
-        position = str(r.get("position") or "")
-        department = str(r.get("department") or "")
-        rate_type = str(r.get("rate_type") or "")
-        base_rate = to_float(r.get("base_rate"))
-        if not emp_id or not full_name:
-            msgs.append("Skipped a row (missing emp_id or full_name)")
-            continue
-        upsert_employee(emp_id, full_name, position, department, rate_type, base_rate)
-        count += 1
-    return count, msgs
+    prepared = _prepare_employees_df(df)
+    ok = prepared["emp_id"].ne("") & prepared["full_name"].ne("")
+    skipped = int((~ok).sum())
+    if skipped:
+        msgs.append(f"Skipped {skipped} row(s) (missing emp_id or full_name)")
+    rows = list(prepared[ok].itertuples(index=False, name=None))
+    return bulk_upsert_employees(rows), msgs
 
 
 def import_payroll_from_df(df: pd.DataFrame) -> tuple[int, list[str]]:
@@ -448,40 +860,28 @@ def import_payroll_from_df(df: pd.DataFrame) -> tuple[int, list[str]]:
     if not required.issubset(set(df.columns)):
         missing = ", ".join(sorted(required - set(df.columns)))
         raise ValueError(f"Payroll sheet missing required columns: {missing}")
-    count = 0
-    for _, r in df.iterrows():
-        try:
-            row = {
-                "emp_id": str(r.get("emp_id")).strip(),
-                "period_start": pd.to_datetime(r.get("period_start")).date() if pd.notna(r.get("period_start")) else None,
-                "period_end": pd.to_datetime(r.get("period_end")).date() if pd.notna(r.get("period_end")) else None,
-                "basic_pay": to_float(r.get("basic_pay")),
-                "overtime_pay": to_float(r.get("overtime_pay")),
-                "allowances": to_float(r.get("allowances")),
-                "bonus": to_float(r.get("bonus")),
-                "sss": to_float(r.get("sss")),
-                "philhealth": to_float(r.get("philhealth")),
-                "pagibig": to_float(r.get("pagibig")),
-                "undertime": to_float(r.get("undertime")),
-                "late": to_float(r.get("late")),
-                "other_deductions": to_float(r.get("other_deductions")),
-                "tax": to_float(r.get("tax")),
-                "notes": str(r.get("notes") or ""),
-            }
-            if not row["emp_id"] or not row["period_start"] or not row["period_end"]:
-                msgs.append("Skipped a row (missing emp_id/period_start/period_end)")
-                continue
-            insert_or_update_payroll(row)
-            count += 1
-        except Exception as e:
-            msgs.append(f"Row error: {e}")
-    return count, msgs
+    prepared = _prepare_payroll_df(df)
+    ok = prepared["emp_id"].ne("") & prepared["period_start"].notna() & prepared["period_end"].notna()
+    skipped = int((~ok).sum())
+    if skipped:
+        msgs.append(f"Skipped {skipped} row(s) (missing or unreadable emp_id/period_start/period_end)")
+    prepared = prepared[ok]
+    # One bad foreign key would roll back the whole batch; report those rows instead.
+    known = existing_emp_ids(prepared["emp_id"].unique().tolist())
+    unknown = ~prepared["emp_id"].isin(known)
+    for emp_id in sorted(prepared.loc[unknown, "emp_id"].unique()):
+        msgs.append(f"Skipped rows for unknown employee {emp_id}")
+    prepared = prepared[~unknown].copy()
+    prepared["period_start"] = prepared["period_start"].dt.date
+    prepared["period_end"] = prepared["period_end"].dt.date
+    rows = list(prepared[list(PAYROLL_COLS)].itertuples(index=False, name=None))
+    return bulk_upsert_payroll(rows), msgs
 
 
 # ----------------------------- APP -----------------------------
 def main():
     st.set_page_config(page_title="REKS Payslips", page_icon="💸", layout="wide")
-    init_db()
+    bootstrap_db()
 
     st.title("💸 REKS Payslips – Marketing Department")
     st.caption("Supabase-backed payroll with admin + self-service PDF payslips.")
@@ -490,7 +890,10 @@ def main():
 
     if mode == "Admin":
         if not admin_gate():
-            st.info("Enter admin password in the sidebar to continue. (Configure ADMIN_PASSWORD in Secrets).")
+            st.info(
+                "Enter admin password in the sidebar to continue. "
+                "(Configure ADMIN_PASSWORD_HASH in Secrets — see hash_password() — or, less securely, ADMIN_PASSWORD.)"
+            )
             return
 
         tabs = st.tabs(["Employees", "Payroll", "All Payroll Records", "Utilities"])
@@ -524,17 +927,12 @@ def main():
             st.caption("Accepted: .xlsx or .csv | Required columns: emp_id, full_name")
             colT, colU = st.columns([1, 1])
             with colT:
-                if st.button("⬇️ Download employee_template.xlsx"):
-                    st.download_button("Save template", data=download_employee_template(), file_name="employee_template.xlsx", mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+                st.download_button("⬇️ Download employee_template.xlsx", data=download_employee_template(), file_name="employee_template.xlsx", mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
             with colU:
                 emp_file = st.file_uploader("Upload Employees file", type=["xlsx", "csv"], key="emp_upload")
                 if emp_file is not None:
                     try:
-                        if emp_file.name.lower().endswith(".csv"):
-                            dfu = pd.read_csv(emp_file)
-                        else:
-                            dfu = pd.read_excel(emp_file)
-                        n, msgs = import_employees_from_df(dfu)
+                        n, msgs = import_employees_from_df(read_upload(emp_file))
                         st.success(f"Imported/updated {n} employees.")
                         if msgs:
                             with st.expander("Import notes"):
@@ -557,10 +955,10 @@ def main():
         # ---------------- Payroll Tab ----------------
         with tabs[1]:
             st.subheader("Add or Update Payroll Entry")
-            df_emp2 = list_employees_df()
-            emp_opts = [f"{r.full_name} ({r.emp_id})" for _, r in df_emp2.iterrows()]
-            picked = st.selectbox("Employee", options=["-"] + emp_opts)
-            selected_emp_id = picked.split("(")[-1].rstrip(")") if picked != "-" else None
+            emp_opts = employee_options()
+            selected_emp_id = st.selectbox(
+                "Employee", options=[None] + list(emp_opts), format_func=lambda k: "-" if k is None else emp_opts[k]
+            )
 
             c1, c2, c3 = st.columns(3)
             with c1:
@@ -611,22 +1009,17 @@ def main():
             st.caption("Accepted: .xlsx or .csv | Required columns: emp_id, period_start, period_end")
             colPT, colPU = st.columns([1, 1])
             with colPT:
-                if st.button("⬇️ Download payroll_template.xlsx"):
-                    st.download_button(
-                        "Save template",
-                        data=download_payroll_template(),
-                        file_name="payroll_template.xlsx",
-                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                    )
+                st.download_button(
+                    "⬇️ Download payroll_template.xlsx",
+                    data=download_payroll_template(),
+                    file_name="payroll_template.xlsx",
+                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                )
             with colPU:
                 pay_file = st.file_uploader("Upload Payroll file", type=["xlsx", "csv"], key="pay_upload")
                 if pay_file is not None:
                     try:
-                        if pay_file.name.lower().endswith(".csv"):
-                            dfp = pd.read_csv(pay_file)
-                        else:
-                            dfp = pd.read_excel(pay_file)
-                        n, msgs = import_payroll_from_df(dfp)
+                        n, msgs = import_payroll_from_df(read_upload(pay_file))
                         st.success(f"Imported/updated {n} payroll rows.")
                         if msgs:
                             with st.expander("Import notes"):
@@ -638,16 +1031,24 @@ def main():
         # ---------------- All Payroll Records Tab ----------------
         with tabs[2]:
             st.subheader("All Payroll Records")
-            df_all = list_payroll_df()
-            st.dataframe(df_all, use_container_width=True)
-            if not df_all.empty:
-                del_id = st.number_input("Delete payroll by ID", min_value=0, step=1)
-                if st.button("Delete Payroll Row"):
-                    if del_id > 0:
-                        delete_payroll(int(del_id))
-                        st.success(f"Deleted payroll id {int(del_id)}")
-                    else:
-                        st.warning("Enter a valid id.")
+            # Tab bodies run on every rerun; only query when the admin asks for the records.
+            if st.checkbox("Load records", key="load_all_pay"):
+                total_rows = count_payroll()
+                pages = max(1, math.ceil(total_rows / PAYROLL_PAGE_SIZE))
+                page = st.number_input("Page", min_value=1, max_value=pages, value=1, step=1)
+                st.caption(f"{total_rows} records · page {page} of {pages}")
+                df_all = compute_totals(list_payroll_df(limit=PAYROLL_PAGE_SIZE, offset=(page - 1) * PAYROLL_PAGE_SIZE))
+                st.dataframe(df_all, use_container_width=True)
+                if not df_all.empty:
+                    with st.expander("Totals per pay period"):
+                        st.dataframe(payroll_totals_by_period(), use_container_width=True)
+                    del_id = st.number_input("Delete payroll by ID", min_value=0, step=1)
+                    if st.button("Delete Payroll Row"):
+                        if del_id > 0:
+                            delete_payroll(int(del_id))
+                            st.success(f"Deleted payroll id {int(del_id)}")
+                        else:
+                            st.warning("Enter a valid id.")
 
         # ---------------- Utilities Tab ----------------
         with tabs[3]:
@@ -656,6 +1057,46 @@ def main():
                 removed = merge_duplicate_payroll()
                 st.success(f"Removed {removed} duplicate rows (kept latest per (emp_id, period)).")
 
+            st.divider()
+            st.markdown("**Backup (CSV)**")
+            st.caption("Same columns as the upload templates, so a backup can be restored via Bulk Upload.")
+            for col, table in zip(st.columns(2), EXPORT_COLUMNS):
+                with col:
+                    if st.button(f"Export {table}", key=f"export_{table}"):
+                        st.download_button(
+                            f"📥 Save {table}.csv",
+                            data=export_table_csv(table),
+                            file_name=f"{table}_{date.today()}.csv",
+                            mime="text/csv",
+                            key=f"save_{table}",
+                        )
+
+            st.divider()
+            st.markdown("**Payslips for a Pay Period**")
+            all_periods = list_payroll_periods()
+            if not all_periods:
+                st.info("No payroll records found.")
+            else:
+                bulk_period = st.selectbox(
+                    "Pay Period", options=all_periods, format_func=lambda p: f"{p[0]} to {p[1]}", key="bulk_period"
+                )
+                bulk_format = st.radio(
+                    "Format", ["ZIP (one PDF per employee)", "Single PDF (for printing)"], horizontal=True
+                )
+                if st.button("Generate all payslips"):
+                    jobs = list_period_payslips(*bulk_period)
+                    with st.spinner("Generating payslips..."):
+                        if bulk_format.startswith("ZIP"):
+                            data, ext, mime = bulk_generate_payslips(jobs), "zip", "application/zip"
+                        else:
+                            data, ext, mime = make_payslips_pdf(jobs), "pdf", "application/pdf"
+                    st.download_button(
+                        f"📥 Download payslips (.{ext})",
+                        data=data,
+                        file_name=f"payslips_{bulk_period[0]}_{bulk_period[1]}.{ext}",
+                        mime=mime,
+                    )
+
     else:
         # ---------------- Employee Self-Service ----------------
         st.subheader("Employee Self-Service")
@@ -665,31 +1106,28 @@ def main():
             if not emp:
                 st.error("Employee ID not found.")
             else:
-                df = list_payroll_df(emp_id)
-                if df.empty:
+                periods = list_payroll_periods(emp_id)
+                if not periods:
                     st.info("No payroll records found.")
                 else:
-                    df["period"] = df["period_start"].astype(str) + " to " + df["period_end"].astype(str)
-                    period = st.selectbox("Select Pay Period", options=df["period"].tolist())
-                    row = df[df["period"] == period].iloc[0].to_dict()
-
-                    gross = sum(
-                        to_float(row.get(k)) for k in ["basic_pay", "overtime_pay", "allowances", "bonus"]
+                    period = st.selectbox(
+                        "Select Pay Period", options=periods, format_func=lambda p: f"{p[0]} to {p[1]}"
                     )
-                    deductions = sum(
-                        to_float(row.get(k))
-                        for k in ["sss", "philhealth", "pagibig", "undertime", "late", "other_deductions", "tax"]
-                    )
-                    net = gross - deductions
-
-                    c1, c2, c3 = st.columns(3)
-                    c1.metric("Gross Pay", peso(gross))
-                    c2.metric("Deductions", peso(deductions))
-                    c3.metric("Net Pay", peso(net))
-
-                    pdf_bytes = make_payslip_pdf(row, emp)
-                    fname = f"payslip_{emp_id}_{row.get('period_start')}_{row.get('period_end')}.pdf"
-                    st.download_button("📥 Download PDF Payslip", data=pdf_bytes, file_name=fname, mime="application/pdf")
+                    row = get_payslip(emp_id, *period)
+                    if row is None:
+                        # The period list is cached separately; the row may have been deleted since.
+                        st.info("This payslip is no longer available. Please pick another pay period.")
+                    else:
+                        c1, c2, c3 = st.columns(3)
+                        c1.metric("Gross Pay", peso(row["gross"]))
+                        c2.metric("Deductions", peso(row["deductions"]))
+                        c3.metric("Net Pay", peso(row["net"]))
+
+                        pdf_bytes = cached_payslip_pdf(row, emp)
+                        fname = payslip_filename(row)
+                        st.download_button(
+                            "📥 Download PDF Payslip", data=pdf_bytes, file_name=fname, mime="application/pdf"
+                        )
 
 
 if __name__ == "__main__":